@@ -4,117 +4,201 @@ Gráficas de eficiencia vs número de robots para determinar
 el punto de operación costo-efectivo.
 """
 
+import io
 import os
+import re
 import sys
+from functools import lru_cache
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import FancyBboxPatch
-import matplotlib.patches as mpatches
 
-# Configuración de estilo
-plt.style.use('seaborn-v0_8-whitegrid')
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['font.size'] = 11
-plt.rcParams['axes.labelsize'] = 12
-plt.rcParams['axes.titlesize'] = 14
-plt.rcParams['legend.fontsize'] = 10
+# Configuración de estilo (se aplica con _configure_mpl en main)
+_STYLE = [
+    'seaborn-v0_8-whitegrid',
+    {
+        'font.family': 'DejaVu Sans',
+        'font.size': 11,
+        'axes.labelsize': 12,
+        'axes.titlesize': 14,
+        'legend.fontsize': 10,
+    },
+]
+
+# Expresiones regulares para los parámetros del header
+_HEADER_RES = {
+    'X': re.compile(r'X=(\d+\.?\d*)'),
+    'Z': re.compile(r'Z=(\d+\.?\d*)'),
+    'W': re.compile(r'W=(\d+\.?\d*)'),
+}
+_RE_N = re.compile(r'N=(\d+)-(\d+)')
+_RE_CAJAS = re.compile(r'Cajas=(\d+)')
+
+# Opciones comunes de guardado (compresión PNG rápida). El ajuste de
+# márgenes lo hace el layout engine 'tight' de cada figura, por lo que no
+# se usa bbox_inches='tight' (evita un render extra para medir la figura).
+_SAVE_KW = dict(dpi=150, facecolor='white', edgecolor='none',
+                pil_kwargs={'compress_level': 1})
+
+# Tamaño del buffer de lectura para los archivos .dat/.csv
+_READ_BUFSIZE = 1 << 17
+
+# Máximo aproximado de etiquetas por punto antes de empezar a saltar puntos
+_MAX_POINT_LABELS = 12
+
+# Formato de los parámetros en los subtítulos: (clave, etiqueta, formato)
+_PARAM_FMT = [
+    ('N_min', 'Mangos/caja', lambda p: f"{p['N_min']}-{p['N_max']}"),
+    ('cajas', 'Cajas', lambda p: f"{p['cajas']}"),
+    ('X', 'Vel', lambda p: f"{p['X']:.0f} cm/s"),
+    ('Z', 'Caja', lambda p: f"{p['Z']:.0f} cm"),
+    ('W', 'Banda', lambda p: f"{p['W']:.0f} cm"),
+]
+
+# Etiquetas de los parámetros en el cuadro de información
+_PARAM_BOX_LABELS = {
+    'N_min': 'Mangos/caja',
+    'cajas': 'Cajas simuladas',
+    'X': 'Vel. banda',
+    'Z': 'Tamaño caja',
+    'W': 'Long. banda',
+}
+
+# Estilos de los cuadros de texto
+_TEXTBOX_WHEAT = dict(boxstyle='round,pad=0.5', facecolor='wheat', alpha=0.9)
+_TEXTBOX_GREEN = dict(boxstyle='round,pad=0.5', facecolor='lightgreen', alpha=0.9)
+
+def _format_params(params, keys=None):
+    """Formatea los parámetros del análisis como subtítulo 'a | b | c'."""
+    parts = [f"{label}: {fmt(params)}" for key, label, fmt in _PARAM_FMT
+             if (keys is None or key in keys) and key in params]
+    return ' | '.join(parts)
 
 def load_robot_analysis(filename):
-    """Carga datos del archivo de análisis de robots."""
-    robots = []
-    avg_eff = []
-    min_eff = []
-    max_eff = []
-    avg_missed = []
+    """
+    Carga datos del archivo de análisis de robots.
+    El parseo se memoiza por ruta y fecha de modificación, así que volver a
+    leer un archivo sin cambios no lo parsea de nuevo.
+    """
+    path = os.path.abspath(filename)
+    cached = _load_robot_analysis_cached(path, os.path.getmtime(path))
+    # Copia superficial: el llamador puede añadir claves (p. ej. cost_eff)
+    # sin alterar la entrada en caché; los arreglos son de solo lectura.
+    return dict(cached, params=dict(cached['params']))
+
+@lru_cache(maxsize=8)
+def _load_robot_analysis_cached(filename, mtime):
+    """Parsea el archivo de análisis de robots (ver load_robot_analysis)."""
     params = {}
     
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith('#'):
-                # Extraer parámetros del header
-                if 'X=' in line and 'Z=' in line:
-                    import re
-                    # Buscar X=valor, Z=valor, W=valor, N=min-max, Cajas=valor
-                    x_match = re.search(r'X=(\d+\.?\d*)', line)
-                    z_match = re.search(r'Z=(\d+\.?\d*)', line)
-                    w_match = re.search(r'W=(\d+\.?\d*)', line)
-                    n_match = re.search(r'N=(\d+)-(\d+)', line)
-                    cajas_match = re.search(r'Cajas=(\d+)', line)
-                    
-                    if x_match:
-                        params['X'] = float(x_match.group(1))
-                    if z_match:
-                        params['Z'] = float(z_match.group(1))
-                    if w_match:
-                        params['W'] = float(w_match.group(1))
-                    if n_match:
-                        params['N_min'] = int(n_match.group(1))
-                        params['N_max'] = int(n_match.group(2))
-                    if cajas_match:
-                        params['cajas'] = int(cajas_match.group(1))
-                continue
-            if not line:
-                continue
-            parts = line.split()
-            if len(parts) >= 5:
-                robots.append(int(parts[0]))
-                avg_eff.append(float(parts[1]))
-                min_eff.append(float(parts[2]))
-                max_eff.append(float(parts[3]))
-                avg_missed.append(float(parts[4]))
+    with open(filename, 'rb', buffering=_READ_BUFSIZE) as f:
+        raw = f.read()
+    
+    # Separar líneas de header (#) de las líneas numéricas
+    header_lines = []
+    data_lines = []
+    for line in raw.split(b'\n'):
+        line = line.strip()
+        if line.startswith(b'#'):
+            header_lines.append(line.decode('utf-8', errors='replace'))
+        elif line:
+            data_lines.append(line)
+    
+    # Extraer parámetros del header
+    for line in header_lines:
+        if 'X=' in line and 'Z=' in line:
+            # Buscar X=valor, Z=valor, W=valor, N=min-max, Cajas=valor
+            for key, rx in _HEADER_RES.items():
+                m = rx.search(line)
+                if m:
+                    params[key] = float(m.group(1))
+            
+            n_match = _RE_N.search(line)
+            if n_match:
+                params['N_min'] = int(n_match.group(1))
+                params['N_max'] = int(n_match.group(2))
+            cajas_match = _RE_CAJAS.search(line)
+            if cajas_match:
+                params['cajas'] = int(cajas_match.group(1))
+    
+    # Parseo numérico en un solo paso (np.loadtxt parsea en C). Los valores
+    # son porcentajes con un decimal significativo: float32 es suficiente.
+    arr = np.loadtxt(io.BytesIO(b'\n'.join(data_lines)), dtype=np.float32,
+                     usecols=range(5), ndmin=2)
+    arr.setflags(write=False)
+    robots = arr[:, 0].astype(np.int16)
+    robots.setflags(write=False)
     
     return {
-        'robots': np.array(robots),
-        'avg_eff': np.array(avg_eff),
-        'min_eff': np.array(min_eff),
-        'max_eff': np.array(max_eff),
-        'avg_missed': np.array(avg_missed),
+        'robots': robots,
+        'avg_eff': arr[:, 1],
+        'min_eff': arr[:, 2],
+        'max_eff': arr[:, 3],
+        'avg_missed': arr[:, 4],
         'params': params
     }
 
 def load_failure_analysis(filename):
     """Carga datos del archivo de análisis de fallas."""
-    data = {
-        'prob_falla': [],
-        'robots_sin_backup': [],
-        'eff_sin_backup': [],
-        'robots_con_backup': [],
-        'num_backup': [],
-        'eff_con_backup': []
-    }
-    
     try:
-        with open(filename, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('#') or not line:
-                    continue
-                parts = line.split()
-                if len(parts) >= 6:
-                    data['prob_falla'].append(float(parts[0]))
-                    data['robots_sin_backup'].append(int(parts[1]))
-                    data['eff_sin_backup'].append(float(parts[2]))
-                    data['robots_con_backup'].append(int(parts[3]))
-                    data['num_backup'].append(int(parts[4]))
-                    data['eff_con_backup'].append(float(parts[5]))
+        with open(filename, 'rb', buffering=_READ_BUFSIZE) as f:
+            raw = f.read()
     except FileNotFoundError:
         return None
     
-    for key in data:
-        data[key] = np.array(data[key])
+    arr = np.loadtxt(io.BytesIO(raw), comments='#', dtype=float,
+                     usecols=range(6), ndmin=2)
     
-    return data
+    return {
+        'prob_falla': arr[:, 0],
+        'robots_sin_backup': arr[:, 1].astype(np.int64),
+        'eff_sin_backup': arr[:, 2],
+        'robots_con_backup': arr[:, 3].astype(np.int64),
+        'num_backup': arr[:, 4].astype(np.int64),
+        'eff_con_backup': arr[:, 5]
+    }
+
+# Ruta JIT opcional (numba) para barridos con muchas llamadas
+try:
+    from numba import njit
+    
+    @njit(cache=True)
+    def _find_optimal_jit(efficiency, threshold):
+        for i in range(efficiency.shape[0]):
+            if efficiency[i] >= threshold:
+                return i
+        return efficiency.shape[0] - 1
+except ImportError:
+    _find_optimal_jit = None
 
 def find_optimal_point(robots, efficiency, threshold=95.0):
     """
     Encuentra el punto óptimo costo-efectivo.
     Busca el menor número de robots que alcanza el umbral de eficiencia.
     """
-    for i, (r, eff) in enumerate(zip(robots, efficiency)):
-        if eff >= threshold:
-            return i, r, eff
-    return len(robots)-1, robots[-1], efficiency[-1]
+    if _find_optimal_jit is not None:
+        i = _find_optimal_jit(efficiency, float(threshold))
+        return i, int(robots[i]), float(efficiency[i])
+    
+    mask = efficiency >= threshold
+    if mask.any():
+        i = int(np.argmax(mask))
+        return i, int(robots[i]), float(efficiency[i])
+    return len(robots)-1, int(robots[-1]), float(efficiency[-1])
+
+def _configure_mpl():
+    """
+    Importa matplotlib con el backend Agg y devuelve el contexto de estilo.
+    Se difiere hasta main() para que importar este módulo no cargue
+    matplotlib ni su caché de fuentes.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt.style.context(_STYLE)
+
+def _new_figure(figsize):
+    """Crea una figura fuera del registro de pyplot."""
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
 
 def calculate_cost_effectiveness(robots, efficiency):
     """
@@ -125,25 +209,42 @@ def calculate_cost_effectiveness(robots, efficiency):
     ce = efficiency / robots
     return ce / ce.max() * 100  # Normalizar a porcentaje
 
-def plot_cost_effectiveness_analysis(data, output_dir):
+def plot_cost_effectiveness_analysis(data, output_dir, fig=None):
     """Genera la gráfica principal de análisis costo-efectivo."""
+    from matplotlib.lines import Line2D
+    import matplotlib.patches as mpatches
     
-    fig, ax1 = plt.subplots(figsize=(12, 8))
+    if fig is None:
+        fig = _new_figure(figsize=(12, 8))
+    fig.set_layout_engine('tight')
+    ax1 = fig.add_subplot()
     
     robots = data['robots']
+    rmin, rmax = int(robots.min()), int(robots.max())
+    n = robots.shape[0]
     avg_eff = data['avg_eff']
     min_eff = data['min_eff']
     max_eff = data['max_eff']
     
-    # Calcular costo-efectividad
-    cost_eff = calculate_cost_effectiveness(robots, avg_eff)
+    # Costo-efectividad precalculada en main()
+    cost_eff = data['cost_eff']
     
     # Encontrar punto óptimo (95% eficiencia)
     idx_95, robot_95, eff_95 = find_optimal_point(robots, avg_eff, 95.0)
     # Encontrar punto de 100% eficiencia
     idx_100, robot_100, eff_100 = find_optimal_point(robots, avg_eff, 99.9)
-    # Encontrar máximo costo-efectividad
-    idx_ce_max = np.argmax(cost_eff)
+    # Máximo costo-efectividad
+    idx_ce_max = data['idx_opt']
+    
+    # Textos de los cuadros de información
+    params = data.get('params', {})
+    params_text = "Parámetros del análisis:\n" + '\n'.join(
+        f"• {_PARAM_BOX_LABELS[key]}: {fmt(params)}"
+        for key, _, fmt in _PARAM_FMT if key in params)
+    info_text = (f"Resultados:\n"
+                f"• Punto óptimo: {robots[idx_ce_max]} robots\n"
+                f"• Eficiencia en óptimo: {avg_eff[idx_ce_max]:.1f}%\n"
+                f"• Para 100%: {robot_100} robots")
     
     # Color palette
     color_eff = '#2E86AB'       # Azul para eficiencia
@@ -162,14 +263,14 @@ def plot_cost_effectiveness_analysis(data, output_dir):
     ax1.set_ylabel('Eficiencia (%)', color=color_eff, fontsize=13, fontweight='bold')
     ax1.tick_params(axis='y', labelcolor=color_eff)
     ax1.set_ylim(0, 105)
-    ax1.set_xlim(robots.min() - 0.5, robots.max() + 0.5)
+    ax1.set_xlim(rmin - 0.5, rmax + 0.5)
     
     # Líneas de referencia
     ax1.axhline(y=95, color='gray', linestyle='--', alpha=0.5, linewidth=1)
     ax1.axhline(y=100, color='gray', linestyle='--', alpha=0.5, linewidth=1)
-    ax1.text(robots.max() + 0.3, 95, '95%', va='center', ha='left', 
+    ax1.text(rmax + 0.3, 95, '95%', va='center', ha='left', 
              color='gray', fontsize=9)
-    ax1.text(robots.max() + 0.3, 100, '100%', va='center', ha='left', 
+    ax1.text(rmax + 0.3, 100, '100%', va='center', ha='left', 
              color='gray', fontsize=9)
     
     # Segundo eje Y para costo-efectividad
@@ -206,72 +307,49 @@ def plot_cost_effectiveness_analysis(data, output_dir):
                              edgecolor='#856404', alpha=0.9))
     
     # Zona de operación recomendada
-    if idx_ce_max < len(robots) - 1:
-        ax1.axvspan(robots[idx_ce_max] - 0.3, robots[min(idx_ce_max + 2, len(robots)-1)] + 0.3, 
+    if idx_ce_max < n - 1:
+        ax1.axvspan(robots[idx_ce_max] - 0.3, robots[min(idx_ce_max + 2, n-1)] + 0.3, 
                    alpha=0.15, color=color_optimal, label='Zona recomendada')
     
     # Título
-    plt.title('Análisis Costo-Efectividad: Número Óptimo de Robots\nMangosa S.A. - Sistema de Etiquetado',
-              fontsize=15, fontweight='bold', pad=20)
+    ax1.set_title('Análisis Costo-Efectividad: Número Óptimo de Robots\nMangosa S.A. - Sistema de Etiquetado',
+                  fontsize=15, fontweight='bold', pad=20)
     
     # Leyenda combinada
     lines = [line1, line2]
     labels = [l.get_label() for l in lines]
     
     # Añadir elementos adicionales a la leyenda
-    star_patch = plt.Line2D([0], [0], marker='*', color='w', markerfacecolor=color_optimal,
+    star_patch = Line2D([0], [0], marker='*', color='w', markerfacecolor=color_optimal,
                             markersize=15, label='Punto óptimo costo-efectivo')
-    diamond_patch = plt.Line2D([0], [0], marker='D', color='w', markerfacecolor=color_100,
+    diamond_patch = Line2D([0], [0], marker='D', color='w', markerfacecolor=color_100,
                                markersize=10, label='100% eficiencia')
     range_patch = mpatches.Patch(color=color_eff, alpha=0.3, label='Rango eficiencia')
     
     ax1.legend(handles=[line1, range_patch, line2, star_patch, diamond_patch],
                loc='lower right', framealpha=0.95, fontsize=10)
     
-    # Cuadro de información con parámetros del sistema
-    params = data.get('params', {})
-    params_text = "Parámetros del análisis:\n"
-    if params:
-        if 'N_min' in params and 'N_max' in params:
-            params_text += f"• Mangos/caja: {params['N_min']}-{params['N_max']}\n"
-        if 'cajas' in params:
-            params_text += f"• Cajas simuladas: {params['cajas']}\n"
-        if 'X' in params:
-            params_text += f"• Vel. banda: {params['X']:.0f} cm/s\n"
-        if 'Z' in params:
-            params_text += f"• Tamaño caja: {params['Z']:.0f} cm\n"
-        if 'W' in params:
-            params_text += f"• Long. banda: {params['W']:.0f} cm"
-    
-    info_text = (f"Resultados:\n"
-                f"• Punto óptimo: {robots[idx_ce_max]} robots\n"
-                f"• Eficiencia en óptimo: {avg_eff[idx_ce_max]:.1f}%\n"
-                f"• Para 100%: {robot_100} robots")
-    
-    props = dict(boxstyle='round,pad=0.5', facecolor='wheat', alpha=0.9)
+    # Cuadros de información con parámetros del sistema y resultados
     ax1.text(0.02, 0.98, params_text, transform=ax1.transAxes, fontsize=9,
-             verticalalignment='top', bbox=props)
-    
-    props2 = dict(boxstyle='round,pad=0.5', facecolor='lightgreen', alpha=0.9)
+             verticalalignment='top', bbox=_TEXTBOX_WHEAT)
     ax1.text(0.02, 0.65, info_text, transform=ax1.transAxes, fontsize=9,
-             verticalalignment='top', bbox=props2)
-    
-    plt.tight_layout()
+             verticalalignment='top', bbox=_TEXTBOX_GREEN)
     
     # Guardar figura
     output_path = os.path.join(output_dir, 'cost_effectiveness_analysis.png')
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', 
-                facecolor='white', edgecolor='none')
+    fig.savefig(output_path, **_SAVE_KW)
     print(f"Gráfica guardada en: {output_path}")
-    
-    return fig
 
-def plot_efficiency_curve(data, output_dir):
+def plot_efficiency_curve(data, output_dir, fig=None):
     """Genera una gráfica simple de la curva de eficiencia."""
     
-    fig, ax = plt.subplots(figsize=(10, 6))
+    if fig is None:
+        fig = _new_figure(figsize=(10, 6))
+    fig.set_layout_engine('tight')
+    ax = fig.add_subplot()
     
     robots = data['robots']
+    rmax = int(robots.max())
     avg_eff = data['avg_eff']
     avg_missed = data['avg_missed']
     params = data.get('params', {})
@@ -287,9 +365,8 @@ def plot_efficiency_curve(data, output_dir):
     # Rellenar área bajo la curva
     ax.fill_between(robots, 0, avg_eff, alpha=0.2, color=color1)
     
-    # Encontrar punto óptimo
-    cost_eff = avg_eff / robots
-    idx_opt = np.argmax(cost_eff)
+    # Punto óptimo
+    idx_opt = data['idx_opt']
     
     # Marcar punto óptimo
     ax.scatter([robots[idx_opt]], [avg_eff[idx_opt]], s=200, c='#28A745', 
@@ -298,15 +375,7 @@ def plot_efficiency_curve(data, output_dir):
     # Construir título con parámetros
     title = 'Curva de Eficiencia vs Número de Robots\n'
     if params:
-        subtitle_parts = []
-        if 'N_min' in params and 'N_max' in params:
-            subtitle_parts.append(f"Mangos/caja: {params['N_min']}-{params['N_max']}")
-        if 'cajas' in params:
-            subtitle_parts.append(f"Cajas: {params['cajas']}")
-        if 'X' in params:
-            subtitle_parts.append(f"Vel: {params['X']:.0f} cm/s")
-        if subtitle_parts:
-            title += ' | '.join(subtitle_parts)
+        title += _format_params(params, keys=('N_min', 'cajas', 'X'))
     else:
         title += 'Sistema de Etiquetado - Mangosa S.A.'
     
@@ -316,7 +385,7 @@ def plot_efficiency_curve(data, output_dir):
     ax.set_title(title, fontsize=12, fontweight='bold')
     
     ax.set_ylim(0, 105)
-    ax.set_xlim(0, robots.max() + 1)
+    ax.set_xlim(0, rmax + 1)
     ax.grid(True, alpha=0.3)
     ax.legend(loc='lower right', fontsize=11)
     
@@ -324,28 +393,26 @@ def plot_efficiency_curve(data, output_dir):
     ax.axhline(y=95, color='orange', linestyle='--', alpha=0.7, label='95%')
     ax.axhline(y=100, color='green', linestyle='--', alpha=0.7, label='100%')
     
-    # Anotaciones
-    for i, (r, e) in enumerate(zip(robots, avg_eff)):
+    # Anotaciones (espaciadas si hay muchas configuraciones)
+    stride = max(1, len(robots) // _MAX_POINT_LABELS)
+    for r, e in zip(robots[::stride], avg_eff[::stride]):
         ax.annotate(f'{e:.0f}%', (r, e), textcoords="offset points", 
                    xytext=(0, 10), ha='center', fontsize=9)
     
-    plt.tight_layout()
-    
     output_path = os.path.join(output_dir, 'efficiency_curve.png')
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', 
-                facecolor='white', edgecolor='none')
+    fig.savefig(output_path, **_SAVE_KW)
     print(f"✓ Gráfica guardada en: {output_path}")
-    
-    return fig
 
-def plot_missed_mangos(data, output_dir):
+def plot_missed_mangos(data, output_dir, fig=None):
     """Genera gráfica de mangos perdidos vs robots."""
     
-    fig, ax = plt.subplots(figsize=(10, 6))
+    if fig is None:
+        fig = _new_figure(figsize=(10, 6))
+    fig.set_layout_engine('tight')
+    ax = fig.add_subplot()
     
     robots = data['robots']
     avg_missed = data['avg_missed']
-    avg_eff = data['avg_eff']
     params = data.get('params', {})
     
     # Gráfica de barras para mangos perdidos
@@ -353,8 +420,7 @@ def plot_missed_mangos(data, output_dir):
                   edgecolor='darkred', linewidth=1.5)
     
     # Colorear diferente la barra óptima
-    cost_eff = avg_eff / robots
-    idx_opt = np.argmax(cost_eff)
+    idx_opt = data['idx_opt']
     bars[idx_opt].set_color('#27ae60')
     bars[idx_opt].set_edgecolor('darkgreen')
     
@@ -363,128 +429,107 @@ def plot_missed_mangos(data, output_dir):
     
     # Construir título con parámetros
     title = 'Mangos No Etiquetados vs Número de Robots\n'
-    if params:
-        subtitle_parts = []
-        if 'N_min' in params and 'N_max' in params:
-            subtitle_parts.append(f"Mangos/caja: {params['N_min']}-{params['N_max']}")
-        if 'cajas' in params:
-            subtitle_parts.append(f"Cajas: {params['cajas']}")
-        if 'X' in params:
-            subtitle_parts.append(f"Vel: {params['X']:.0f} cm/s")
-        if subtitle_parts:
-            title += ' | '.join(subtitle_parts)
+    title += _format_params(params, keys=('N_min', 'cajas', 'X'))
     
     ax.set_title(title, fontsize=12, fontweight='bold')
     
     ax.set_xticks(robots)
     ax.grid(True, axis='y', alpha=0.3)
     
-    # Valores sobre barras
-    for bar, val in zip(bars, avg_missed):
-        height = bar.get_height()
-        ax.annotate(f'{val:.1f}',
-                   xy=(bar.get_x() + bar.get_width() / 2, height),
-                   xytext=(0, 3), textcoords="offset points",
-                   ha='center', va='bottom', fontsize=10, fontweight='bold')
-    
-    plt.tight_layout()
+    # Valores sobre barras (espaciados si hay muchas configuraciones)
+    stride = max(1, len(robots) // _MAX_POINT_LABELS)
+    labels = [f'{v:.1f}' if i % stride == 0 else ''
+              for i, v in enumerate(avg_missed)]
+    ax.bar_label(bars, labels=labels, padding=3, fontsize=10, fontweight='bold')
     
     output_path = os.path.join(output_dir, 'missed_mangos.png')
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', 
-                facecolor='white', edgecolor='none')
+    fig.savefig(output_path, **_SAVE_KW)
     print(f"✓ Gráfica guardada en: {output_path}")
+
+def _draw_efficiency(ax, data):
+    """Dibuja la eficiencia promedio con su rango min-max."""
+    robots = data['robots']
+    avg_eff = data['avg_eff']
+    idx_opt = data['idx_opt']
+    
+    ax.fill_between(robots, data['min_eff'], data['max_eff'], alpha=0.3, color='#3498db')
+    ax.plot(robots, avg_eff, 'o-', color='#2980b9', linewidth=2, markersize=8)
+    ax.scatter([robots[idx_opt]], [avg_eff[idx_opt]], s=150, c='#e74c3c', 
+               marker='*', zorder=10)
+    ax.axhline(y=95, color='orange', linestyle='--', alpha=0.5)
+    ax.set_xlabel('Número de Robots')
+    ax.set_ylabel('Eficiencia (%)')
+    ax.set_title('Eficiencia vs Robots')
+    ax.set_ylim(0, 105)
+    ax.grid(True, alpha=0.3)
+
+def _draw_cost_eff(ax, data):
+    """Dibuja el índice de costo-efectividad por número de robots."""
+    robots = data['robots']
     
-    return fig
+    colors = np.full(len(robots), '#9b59b6', dtype='<U7')
+    colors[data['idx_opt']] = '#27ae60'
+    ax.bar(robots, data['cost_eff'], color=colors, alpha=0.7, edgecolor='black')
+    ax.set_xlabel('Número de Robots')
+    ax.set_ylabel('Índice Costo-Efectividad (%)')
+    ax.set_title('Costo-Efectividad por Robot')
+    ax.set_xticks(robots)
+    ax.grid(True, axis='y', alpha=0.3)
 
-def plot_combined_analysis(data, output_dir):
+def _draw_missed(ax, data):
+    """Dibuja los mangos perdidos promedio por caja."""
+    robots = data['robots']
+    avg_missed = data['avg_missed']
+    idx_opt = data['idx_opt']
+    
+    ax.plot(robots, avg_missed, 's-', color='#e74c3c', linewidth=2, markersize=8)
+    ax.fill_between(robots, 0, avg_missed, alpha=0.2, color='#e74c3c')
+    ax.scatter([robots[idx_opt]], [avg_missed[idx_opt]], s=150, c='#27ae60', 
+               marker='*', zorder=10)
+    ax.set_xlabel('Número de Robots')
+    ax.set_ylabel('Mangos Perdidos/Caja')
+    ax.set_title('Mangos No Etiquetados')
+    ax.grid(True, alpha=0.3)
+
+def _draw_incremental(ax, data):
+    """Dibuja la ganancia de eficiencia por cada robot adicional."""
+    robots = data['robots']
+    
+    incremental = np.diff(data['avg_eff'], prepend=0)
+    colors = np.select([incremental > 5, incremental > 2],
+                       ['#27ae60', '#f39c12'], default='#e74c3c')
+    ax.bar(robots, incremental, color=colors, alpha=0.7, edgecolor='black')
+    ax.axhline(y=0, color='black', linewidth=0.5)
+    ax.set_xlabel('Número de Robots')
+    ax.set_ylabel('Ganancia Incremental (%)')
+    ax.set_title('Ganancia por Robot Adicional')
+    ax.set_xticks(robots)
+    ax.grid(True, axis='y', alpha=0.3)
+
+def plot_combined_analysis(data, output_dir, fig=None):
     """Genera una figura con múltiples subgráficas."""
     
-    fig = plt.figure(figsize=(14, 10))
+    if fig is None:
+        fig = _new_figure(figsize=(14, 10))
+    fig.set_layout_engine('tight')
     
-    robots = data['robots']
-    avg_eff = data['avg_eff']
-    min_eff = data['min_eff']
-    max_eff = data['max_eff']
-    avg_missed = data['avg_missed']
     params = data.get('params', {})
     
-    cost_eff = calculate_cost_effectiveness(robots, avg_eff)
-    idx_opt = np.argmax(cost_eff)
-    
-    # Subplot 1: Eficiencia con rango
-    ax1 = fig.add_subplot(2, 2, 1)
-    ax1.fill_between(robots, min_eff, max_eff, alpha=0.3, color='#3498db')
-    ax1.plot(robots, avg_eff, 'o-', color='#2980b9', linewidth=2, markersize=8)
-    ax1.scatter([robots[idx_opt]], [avg_eff[idx_opt]], s=150, c='#e74c3c', 
-                marker='*', zorder=10)
-    ax1.axhline(y=95, color='orange', linestyle='--', alpha=0.5)
-    ax1.set_xlabel('Número de Robots')
-    ax1.set_ylabel('Eficiencia (%)')
-    ax1.set_title('Eficiencia vs Robots')
-    ax1.set_ylim(0, 105)
-    ax1.grid(True, alpha=0.3)
-    
-    # Subplot 2: Costo-Efectividad
-    ax2 = fig.add_subplot(2, 2, 2)
-    colors = ['#27ae60' if i == idx_opt else '#9b59b6' for i in range(len(robots))]
-    ax2.bar(robots, cost_eff, color=colors, alpha=0.7, edgecolor='black')
-    ax2.set_xlabel('Número de Robots')
-    ax2.set_ylabel('Índice Costo-Efectividad (%)')
-    ax2.set_title('Costo-Efectividad por Robot')
-    ax2.set_xticks(robots)
-    ax2.grid(True, axis='y', alpha=0.3)
-    
-    # Subplot 3: Mangos perdidos
-    ax3 = fig.add_subplot(2, 2, 3)
-    ax3.plot(robots, avg_missed, 's-', color='#e74c3c', linewidth=2, markersize=8)
-    ax3.fill_between(robots, 0, avg_missed, alpha=0.2, color='#e74c3c')
-    ax3.scatter([robots[idx_opt]], [avg_missed[idx_opt]], s=150, c='#27ae60', 
-                marker='*', zorder=10)
-    ax3.set_xlabel('Número de Robots')
-    ax3.set_ylabel('Mangos Perdidos/Caja')
-    ax3.set_title('Mangos No Etiquetados')
-    ax3.grid(True, alpha=0.3)
-    
-    # Subplot 4: Eficiencia incremental
-    ax4 = fig.add_subplot(2, 2, 4)
-    incremental = np.diff(avg_eff, prepend=0)
-    colors = ['#27ae60' if inc > 5 else '#f39c12' if inc > 2 else '#e74c3c' 
-              for inc in incremental]
-    ax4.bar(robots, incremental, color=colors, alpha=0.7, edgecolor='black')
-    ax4.axhline(y=0, color='black', linewidth=0.5)
-    ax4.set_xlabel('Número de Robots')
-    ax4.set_ylabel('Ganancia Incremental (%)')
-    ax4.set_title('Ganancia por Robot Adicional')
-    ax4.set_xticks(robots)
-    ax4.grid(True, axis='y', alpha=0.3)
+    ((ax1, ax2), (ax3, ax4)) = fig.subplots(2, 2)
+    _draw_efficiency(ax1, data)
+    _draw_cost_eff(ax2, data)
+    _draw_missed(ax3, data)
+    _draw_incremental(ax4, data)
     
     # Título general con parámetros
     title = 'Análisis Completo: Sistema de Etiquetado - Mangosa S.A.\n'
-    if params:
-        subtitle_parts = []
-        if 'N_min' in params and 'N_max' in params:
-            subtitle_parts.append(f"Mangos/caja: {params['N_min']}-{params['N_max']}")
-        if 'cajas' in params:
-            subtitle_parts.append(f"Cajas: {params['cajas']}")
-        if 'X' in params:
-            subtitle_parts.append(f"Vel: {params['X']:.0f} cm/s")
-        if 'Z' in params:
-            subtitle_parts.append(f"Caja: {params['Z']:.0f} cm")
-        if 'W' in params:
-            subtitle_parts.append(f"Banda: {params['W']:.0f} cm")
-        if subtitle_parts:
-            title += ' | '.join(subtitle_parts)
-    
-    fig.suptitle(title, fontsize=14, fontweight='bold', y=1.02)
-    
-    plt.tight_layout()
+    title += _format_params(params)
+    
+    fig.suptitle(title, fontsize=14, fontweight='bold')
     
     output_path = os.path.join(output_dir, 'combined_analysis.png')
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', 
-                facecolor='white', edgecolor='none')
+    fig.savefig(output_path, **_SAVE_KW)
     print(f"✓ Gráfica guardada en: {output_path}")
-    
-    return fig
 
 def main():
     """Función principal del script."""
@@ -523,17 +568,24 @@ def main():
     # Cargar datos
     data = load_robot_analysis(robot_file)
     
+    # Costo-efectividad y punto óptimo: se calculan una sola vez y
+    # todas las gráficas usan la misma definición
+    data['cost_eff'] = calculate_cost_effectiveness(data['robots'], data['avg_eff'])
+    data['idx_opt'] = int(np.argmax(data['cost_eff']))
+    
     print(f"   → {len(data['robots'])} configuraciones de robots analizadas")
-    print(f"   → Rango: {data['robots'].min()} a {data['robots'].max()} robots\n")
+    rmin, rmax = int(data['robots'].min()), int(data['robots'].max())
+    print(f"   → Rango: {rmin} a {rmax} robots\n")
     
     # Generar gráficas
     print("Generando gráficas...\n")
     
     try:
-        plot_cost_effectiveness_analysis(data, output_dir)
-        plot_efficiency_curve(data, output_dir)
-        plot_missed_mangos(data, output_dir)
-        plot_combined_analysis(data, output_dir)
+        with _configure_mpl():
+            plot_cost_effectiveness_analysis(data, output_dir)
+            plot_efficiency_curve(data, output_dir)
+            plot_missed_mangos(data, output_dir)
+            plot_combined_analysis(data, output_dir)
         
         print("\n" + "="*60)
         print("  GRÁFICAS GENERADAS EXITOSAMENTE")
@@ -546,8 +598,8 @@ def main():
         print("   • combined_analysis.png            (Análisis combinado)")
         
         # Mostrar resumen del punto óptimo
-        cost_eff = calculate_cost_effectiveness(data['robots'], data['avg_eff'])
-        idx_opt = np.argmax(cost_eff)
+        cost_eff = data['cost_eff']
+        idx_opt = data['idx_opt']
         
         print("\n" + "-"*60)
         print("  RESULTADO DEL ANÁLISIS")